@@ -14,6 +14,13 @@ import json
 import pandas as pd
 from datetime import datetime
 import io
+import shutil
+import tempfile
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib encoder
+    orjson = None
 
 # Fix import path for Streamlit Cloud
 current_dir = Path(__file__).parent.absolute()
@@ -70,19 +77,101 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-@st.cache_resource
-def load_agent():
-    """Load or initialize LIBRIS agent"""
-    kb_path = Path('knowledge_base/libris_catalog.json')
-    
-    if not kb_path.exists():
+KB_PATH = Path('knowledge_base/libris_catalog.json')
+
+
+def ensure_catalog():
+    """Write the base collection to the catalog file on first run"""
+    if not KB_PATH.exists():
         # Initialize with base collection
         catalog = initialize_catalog()
-        kb_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(kb_path, 'w', encoding='utf-8') as f:
-            json.dump(catalog, f, indent=2, ensure_ascii=False)
-    
-    return LIBRISAgent(str(kb_path))
+        KB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        if orjson is not None:
+            with open(KB_PATH, 'wb') as f:
+                f.write(orjson.dumps(catalog, option=orjson.OPT_NON_STR_KEYS))
+        else:
+            with open(KB_PATH, 'w', encoding='utf-8') as f:
+                json.dump(catalog, f, ensure_ascii=False, separators=(',', ':'))
+
+
+@st.cache_resource(max_entries=1)
+def load_agent(sig):
+    """Load the LIBRIS agent for the given catalog signature
+
+    Keyed on the catalog file rather than per-session state, so every
+    session shares one agent and moves to a fresh one once the catalog
+    on disk changes.
+    """
+    return LIBRISAgent(str(KB_PATH))
+
+
+def catalog_signature():
+    """Return (mtime, size) of the catalog file for keying cached data"""
+    stat = KB_PATH.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+@st.cache_data
+def cached_statistics(_agent, sig):
+    """Catalog statistics, recomputed only when the catalog file changes"""
+    return _agent.get_statistics()
+
+
+@st.cache_data
+def sorted_index_keys(_agent, sig, kind):
+    """Sorted keys of the by_author / by_theme / by_period index"""
+    return sorted(_agent.catalog['indices'][f'by_{kind}'].keys())
+
+
+@st.cache_data
+def all_works_dataframe(_agent, sig):
+    """Date/Author/Title/Period table of every catalog entry"""
+    return pd.DataFrame.from_records(
+        [
+            (e.get('date', 'Unknown'), e.get('author', 'Unknown'),
+             e.get('title', 'Unknown'), e.get('period', 'Unknown'))
+            for e in _agent.catalog['entries']
+        ],
+        columns=['Date', 'Author', 'Title', 'Period']
+    )
+
+
+@st.cache_data(max_entries=128)
+def cached_search(_agent, query, search_type, max_results, sig):
+    """agent.search memoized per query, mode, limit and catalog version"""
+    return _agent.search(query, max_results=max_results, search_type=search_type)
+
+
+def export_payload(agent, entries, fmt):
+    """Export entries and return the file contents as raw bytes"""
+    return Path(agent.export(entries, format=fmt)).read_bytes()
+
+
+@st.cache_data(max_entries=16)
+def cached_export(_agent, key, fmt, _entries):
+    """Export payload memoized on a key identifying the exported entries"""
+    return export_payload(_agent, _entries, fmt)
+
+
+@st.cache_data(max_entries=8)
+def cached_catalog_export(sig, fmt):
+    """(entry count, export payload) of the whole catalog at this signature"""
+    agent = load_agent(sig)
+    entries = [{'entry': e} for e in agent.catalog['entries']]
+    return len(entries), export_payload(agent, entries, fmt)
+
+
+MAX_EXPANDERS = 25
+
+
+def entry_limit(count, key):
+    """Number of works to render, bounded by a slider for large groups"""
+    if count <= MAX_EXPANDERS:
+        return count
+    limit = st.slider("Show first N works", 1, count, MAX_EXPANDERS, key=key)
+    if limit < count:
+        st.caption(f"Showing {limit} of {count} works")
+    return limit
 
 
 def main():
@@ -93,7 +182,9 @@ def main():
     st.markdown('<div class="sub-header">Advanced Librarian AI Agent for Historical & Philosophical Collections</div>', unsafe_allow_html=True)
     
     # Initialize agent
-    agent = load_agent()
+    ensure_catalog()
+    catalog_sig = catalog_signature()
+    agent = load_agent(catalog_sig)
     
     # Sidebar
     with st.sidebar:
@@ -114,7 +205,7 @@ def main():
         # Statistics
         st.markdown("---")
         st.markdown("### 📊 Catalog Statistics")
-        stats = agent.get_statistics()
+        stats = cached_statistics(agent, catalog_sig)
         
         col1, col2 = st.columns(2)
         with col1:
@@ -158,81 +249,86 @@ def main():
         
         max_results = st.slider("Maximum results", 5, 50, 15)
         
+        search_key = (query, search_type, max_results, catalog_sig)
+        
         if st.button("🔍 Search", type="primary"):
             if query:
                 with st.spinner("Searching..."):
-                    results = agent.search(
-                        query, 
-                        max_results=max_results,
-                        search_type=search_type.lower()
+                    results = cached_search(
+                        agent,
+                        query,
+                        search_type.lower(),
+                        max_results,
+                        catalog_sig
                     )
                 
-                if results:
-                    st.success(f"Found {len(results)} results")
-                    
-                    # Display results
-                    for i, result in enumerate(results, 1):
-                        entry = result['entry']
-                        score = result.get('score', 0)
-                        
-                        with st.expander(f"{i}. {entry.get('author', 'Unknown')} ({entry.get('date', 'Unknown')}) - Score: {score:.2f}"):
-                            st.markdown(f"**Title**: {entry.get('title', 'Unknown')}")
-                            
-                            if entry.get('themes'):
-                                st.markdown(f"**Themes**: {', '.join(entry['themes'])}")
-                            
-                            if entry.get('period'):
-                                st.markdown(f"**Period**: {entry.get('period')}")
-                            
-                            if entry.get('notes'):
-                                st.markdown(f"**Notes**: {entry.get('notes')}")
-                            
-                            if result.get('matched_fields'):
-                                st.caption(f"Matched in: {', '.join(result['matched_fields'])}")
-                    
-                    # Export search results
-                    st.markdown("---")
-                    st.markdown("### Export Search Results")
+                # Keep results across reruns so other widgets don't clear them
+                st.session_state['search'] = (search_key, results)
+            else:
+                st.session_state.pop('search', None)
+                st.warning("Please enter a search query")
+        
+        results_key, results = st.session_state.get('search', (None, None))
+        
+        if results_key is not None and results_key != search_key:
+            st.caption(f"Showing results for \"{results_key[0]}\" — press Search to update")
+        
+        if results:
+            st.success(f"Found {len(results)} results")
+            
+            # Display results
+            for i, result in enumerate(results, 1):
+                entry = result['entry']
+                score = result.get('score', 0)
+                
+                with st.expander(f"{i}. {entry.get('author', 'Unknown')} ({entry.get('date', 'Unknown')}) - Score: {score:.2f}"):
+                    st.markdown(f"**Title**: {entry.get('title', 'Unknown')}")
                     
-                    col1, col2, col3 = st.columns(3)
+                    if entry.get('themes'):
+                        st.markdown(f"**Themes**: {', '.join(entry['themes'])}")
                     
-                    with col1:
-                        if st.button("📄 Export to CSV"):
-                            csv_path = agent.export(results, format='csv')
-                            with open(csv_path, 'r', encoding='utf-8') as f:
-                                st.download_button(
-                                    "Download CSV",
-                                    f.read(),
-                                    file_name=f"libris_search_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                                    mime="text/csv"
-                                )
+                    if entry.get('period'):
+                        st.markdown(f"**Period**: {entry.get('period')}")
                     
-                    with col2:
-                        if st.button("📚 Export to BibTeX"):
-                            bibtex_path = agent.export(results, format='bibtex')
-                            with open(bibtex_path, 'r', encoding='utf-8') as f:
-                                st.download_button(
-                                    "Download BibTeX",
-                                    f.read(),
-                                    file_name=f"libris_search_{datetime.now().strftime('%Y%m%d_%H%M%S')}.bib",
-                                    mime="text/plain"
-                                )
+                    if entry.get('notes'):
+                        st.markdown(f"**Notes**: {entry.get('notes')}")
                     
-                    with col3:
-                        if st.button("📝 Export to Markdown"):
-                            md_path = agent.export(results, format='markdown')
-                            with open(md_path, 'r', encoding='utf-8') as f:
-                                st.download_button(
-                                    "Download Markdown",
-                                    f.read(),
-                                    file_name=f"libris_search_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-                                    mime="text/markdown"
-                                )
-                
-                else:
-                    st.warning("No results found. Try different keywords or search mode.")
-            else:
-                st.warning("Please enter a search query")
+                    if result.get('matched_fields'):
+                        st.caption(f"Matched in: {', '.join(result['matched_fields'])}")
+            
+            # Export search results
+            st.markdown("---")
+            st.markdown("### Export Search Results")
+            
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            col1, col2, col3 = st.columns(3)
+            
+            with col1:
+                st.download_button(
+                    "📄 Export to CSV",
+                    cached_export(agent, results_key, 'csv', results),
+                    file_name=f"libris_search_{timestamp}.csv",
+                    mime="text/csv"
+                )
+            
+            with col2:
+                st.download_button(
+                    "📚 Export to BibTeX",
+                    cached_export(agent, results_key, 'bibtex', results),
+                    file_name=f"libris_search_{timestamp}.bib",
+                    mime="text/plain"
+                )
+            
+            with col3:
+                st.download_button(
+                    "📝 Export to Markdown",
+                    cached_export(agent, results_key, 'markdown', results),
+                    file_name=f"libris_search_{timestamp}.md",
+                    mime="text/markdown"
+                )
+        
+        elif results is not None:
+            st.warning("No results found. Try different keywords or search mode.")
     
     # TAB 2: PROCESS DOCUMENT
     with tab2:
@@ -254,12 +350,18 @@ def main():
             
             if st.button("🚀 Process Document", type="primary"):
                 with st.spinner("Processing document... This may take a moment."):
-                    # Save uploaded file temporarily
-                    temp_path = Path(f"temp_{uploaded_file.name}")
-                    with open(temp_path, 'wb') as f:
-                        f.write(uploaded_file.getbuffer())
+                    temp_dir = None
                     
                     try:
+                        # Save uploaded file temporarily; the directory is unique
+                        # per upload, so concurrent sessions never share a path
+                        # while the file keeps its stable temp_<name> name
+                        temp_dir = Path(tempfile.mkdtemp(prefix="libris_upload_"))
+                        temp_path = temp_dir / f"temp_{Path(uploaded_file.name).name}"
+                        uploaded_file.seek(0)
+                        with open(temp_path, 'wb') as f:
+                            shutil.copyfileobj(uploaded_file, f, length=1 << 20)
+                        
                         # Process document
                         report = agent.process_document(str(temp_path))
                         
@@ -293,21 +395,24 @@ def main():
                                 for issue in report['quality_issues'][:20]:
                                     st.caption(f"• {issue}")
                         
-                        # Clear cache to reload agent with new data
-                        st.cache_resource.clear()
+                        # save_catalog() changed the catalog signature, so every
+                        # session reloads the agent with new data on its next rerun
                         
                     except Exception as e:
                         st.error(f"Error processing document: {str(e)}")
                     
                     finally:
                         # Clean up temp file
-                        if temp_path.exists():
-                            temp_path.unlink()
+                        if temp_dir is not None:
+                            shutil.rmtree(temp_dir, ignore_errors=True)
     
     # TAB 3: EXPLORE COLLECTION
     with tab3:
         st.header("📊 Explore the Collection")
         
+        entries_list = agent.catalog['entries']
+        index_maps = agent.catalog['indices']
+        
         # Filters
         col1, col2 = st.columns(2)
         
@@ -318,15 +423,16 @@ def main():
             )
         
         if filter_type == "By Author":
-            authors = list(agent.catalog['indices']['by_author'].keys())
-            selected_author = st.selectbox("Select Author", sorted(authors))
+            authors = sorted_index_keys(agent, catalog_sig, 'author')
+            selected_author = st.selectbox("Select Author", authors)
             
             if selected_author:
-                indices = agent.catalog['indices']['by_author'][selected_author]
-                entries = [agent.catalog['entries'][i] for i in indices]
+                indices = index_maps['by_author'][selected_author]
                 
                 st.markdown(f"### Works by {selected_author}")
-                for entry in entries:
+                limit = entry_limit(len(indices), key='limit_by_author')
+                for i in indices[:limit]:
+                    entry = entries_list[i]
                     with st.expander(f"{entry.get('date', 'Unknown')} - {entry.get('title', 'Unknown')}"):
                         if entry.get('themes'):
                             st.markdown(f"**Themes**: {', '.join(entry['themes'])}")
@@ -334,30 +440,32 @@ def main():
                             st.markdown(f"**Notes**: {entry.get('notes')}")
         
         elif filter_type == "By Theme":
-            themes = list(agent.catalog['indices']['by_theme'].keys())
-            selected_theme = st.selectbox("Select Theme", sorted(themes))
+            themes = sorted_index_keys(agent, catalog_sig, 'theme')
+            selected_theme = st.selectbox("Select Theme", themes)
             
             if selected_theme:
-                indices = agent.catalog['indices']['by_theme'][selected_theme]
-                entries = [agent.catalog['entries'][i] for i in indices]
+                indices = index_maps['by_theme'][selected_theme]
                 
                 st.markdown(f"### Works on {selected_theme}")
-                for entry in entries:
+                limit = entry_limit(len(indices), key='limit_by_theme')
+                for i in indices[:limit]:
+                    entry = entries_list[i]
                     with st.expander(f"{entry.get('author', 'Unknown')} - {entry.get('title', 'Unknown')}"):
                         st.markdown(f"**Date**: {entry.get('date', 'Unknown')}")
                         if entry.get('notes'):
                             st.markdown(f"**Notes**: {entry.get('notes')}")
         
         elif filter_type == "By Period":
-            periods = list(agent.catalog['indices']['by_period'].keys())
-            selected_period = st.selectbox("Select Period", sorted(periods))
+            periods = sorted_index_keys(agent, catalog_sig, 'period')
+            selected_period = st.selectbox("Select Period", periods)
             
             if selected_period:
-                indices = agent.catalog['indices']['by_period'][selected_period]
-                entries = [agent.catalog['entries'][i] for i in indices]
+                indices = index_maps['by_period'][selected_period]
                 
                 st.markdown(f"### Works from {selected_period}")
-                for entry in entries:
+                limit = entry_limit(len(indices), key='limit_by_period')
+                for i in indices[:limit]:
+                    entry = entries_list[i]
                     with st.expander(f"{entry.get('author', 'Unknown')} - {entry.get('title', 'Unknown')}"):
                         st.markdown(f"**Date**: {entry.get('date', 'Unknown')}")
                         if entry.get('themes'):
@@ -366,17 +474,8 @@ def main():
         else:  # All Works
             st.markdown("### All Works in Catalog")
             
-            # Create DataFrame for better display
-            df_data = []
-            for entry in agent.catalog['entries'][:100]:  # Limit to first 100
-                df_data.append({
-                    'Date': entry.get('date', 'Unknown'),
-                    'Author': entry.get('author', 'Unknown'),
-                    'Title': entry.get('title', 'Unknown'),
-                    'Period': entry.get('period', 'Unknown')
-                })
-            
-            df = pd.DataFrame(df_data)
+            # st.dataframe virtualizes scrolling, so the full catalog is shown
+            df = all_works_dataframe(agent, catalog_sig)
             st.dataframe(df, use_container_width=True, height=600)
     
     # TAB 4: EXPORT
@@ -402,13 +501,6 @@ def main():
         
         if st.button("📥 Generate Export", type="primary"):
             with st.spinner("Generating export..."):
-                # Get entries to export
-                if filter_query:
-                    results = agent.search(filter_query, max_results=1000)
-                    entries = results
-                else:
-                    entries = [{'entry': e} for e in agent.catalog['entries']]
-                
                 # Map format names
                 format_map = {
                     "CSV (Spreadsheet)": "csv",
@@ -419,11 +511,13 @@ def main():
                 }
                 
                 format_code = format_map[export_format]
-                export_path = agent.export(entries, format=format_code)
-                
-                # Read file and offer download
-                with open(export_path, 'rb') as f:
-                    file_data = f.read()
+                if filter_query:
+                    entries = agent.search(filter_query, max_results=1000)
+                    entry_count = len(entries)
+                    file_data = export_payload(agent, entries, format_code)
+                else:
+                    # Whole-catalog exports only change when the catalog does
+                    entry_count, file_data = cached_catalog_export(catalog_sig, format_code)
                 
                 mime_types = {
                     'csv': 'text/csv',
@@ -441,7 +535,7 @@ def main():
                     'xlsx': 'xlsx'
                 }
                 
-                st.success(f"✅ Exported {len(entries)} entries to {export_format}")
+                st.success(f"✅ Exported {entry_count} entries to {export_format}")
                 
                 st.download_button(
                     f"📥 Download {export_format}",